@@ -1,95 +1,392 @@
 import streamlit as st
-from groq import Groq
-import PyPDF2
+from groq import AsyncGroq, RateLimitError, InternalServerError, APIConnectionError, APITimeoutError, APIStatusError
 import os
 import re
 import pandas as pd
+import numpy as np
 from dotenv import load_dotenv
 from datetime import datetime
-import tempfile
-import openpyxl
+import xlsxwriter
 from io import BytesIO
 import time  # For timing functionality
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
+import threading
+import hashlib
+import functools
+import json
+import random
+import traceback
+from cachetools import TTLCache
+from pdf_extraction import extract_pdf_for_batch
 
-# Initialize AI client
-def initialize_groq_client():
+# Default number of resumes analyzed concurrently against the Groq API
+DEFAULT_POOL_SIZE = 8
+
+# Adaptive concurrency: the floor it backs off to on rate limits, and successes needed before raising it again
+MIN_CONCURRENCY = 2
+CONCURRENCY_RAMP_UP_SUCCESSES = 5
+
+# Retries for rate-limited and transiently failed calls, and the base delay when the server doesn't say how long to wait
+API_RETRIES = 3
+RETRY_BASE_DELAY_SECONDS = 1.0
+
+# Upper bound on a server-supplied Retry-After, so one header can't stall a batch indefinitely
+RETRY_MAX_DELAY_SECONDS = 30.0
+
+# Statuses retried on top of rate limits and server errors: request timeout and lock conflict, as the Groq SDK does
+RETRYABLE_STATUS_CODES = (408, 409)
+
+# Resumes sent per API call; 1 keeps the original one-request-per-resume behaviour
+DEFAULT_BATCH_SIZE = 1
+MAX_BATCH_SIZE = 8
+
+# Token budget for the model, estimated from characters when batching resumes
+MODEL_CONTEXT_TOKENS = 32768
+ANALYSIS_MAX_TOKENS = 3500
+CHARS_PER_TOKEN = 4
+# Headroom for the chars-per-token estimate undercounting, e.g. on code-heavy or non-English resumes
+CONTEXT_SAFETY_MARGIN_TOKENS = 2048
+
+# Per-request timeout for Groq API calls; batched calls get this much read time per resume
+GROQ_TIMEOUT_SECONDS = 60.0
+GROQ_CONNECT_TIMEOUT_SECONDS = 5.0
+
+# Number of PDFs extracted in parallel before analysis starts
+PDF_EXTRACTION_WORKERS = 10
+
+# Pending PDF bytes above which extraction moves to worker processes instead of threads
+# Starting a spawn pool costs close to a second, while PDFium reads typical resumes in about a millisecond,
+# so only very large uploads have enough parsing work to pay for it
+PROCESS_POOL_MIN_BYTES = 50 * 1024 * 1024
+
+# Bounds for cached extraction, analysis and parsing results
+CACHE_MAX_ENTRIES = 500
+CACHE_TTL_SECONDS = 3600
+
+# Longest stretch of resume text searched for a LinkedIn URL
+MAX_URL_SCAN_CHARS = 200_000
+
+# Patterns compiled once at import rather than on every resume
+_API_TIME_RE = re.compile(r'API call time: (\d+\.\d+)')
+_DEBUG_STRONG_SCORE_RE = re.compile(r'Strong Matches Score:?\s*(\d+)')
+_DEBUG_PARTIAL_SCORE_RE = re.compile(r'Partial Matches Score:?\s*(\d+)')
+# A full URL is preferred over a bare one; any www. or "linkedin: https://..." form also contains the bare one,
+# so those need no patterns of their own
+_LINKEDIN_URL_RES = [re.compile(pattern, re.IGNORECASE) for pattern in [
+    r'https?://(?:www\.)?linkedin\.com/in/[\w-]+(?:/[\w-]+)*',
+    r'linkedin\.com/in/[\w-]+(?:/[\w-]+)*',
+]]
+_LINKEDIN_WORD_RE = re.compile(r'linkedin', re.IGNORECASE)
+_LINKEDIN_MENTION_RE = re.compile(r'linkedin[\s:]*([^\s]+)', re.IGNORECASE)
+_LINKEDIN_PROFILE_RE = re.compile(r'https?://(?:www\.)?linkedin\.com/in/[\w-]+(?:/[\w-]+)*')
+_PORTFOLIO_URL_RE = re.compile(r'https?://(?:www\.)?(?:github\.com|gitlab\.com|bitbucket\.org|behance\.net|dribbble\.com|[\w-]+\.(?:com|io|org|net))/\S+')
+_STRONG_SCORE_RE = re.compile(r'Strong Matches Score:?\s*(\d+(?:\.\d+)?)')
+_PARTIAL_SCORE_RE = re.compile(r'Partial Matches Score:?\s*(\d+(?:\.\d+)?)')
+_NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)')
+# Each markdown pattern is paired with the delimiter it needs, so passes that cannot match are skipped
+_MARKDOWN_RES = [
+    ('**', re.compile(r'\*\*(.*?)\*\*')),  # Bold
+    ('*', re.compile(r'\*(.*?)\*')),       # Italic
+    ('__', re.compile(r'__(.*?)__')),      # Underline
+    ('_', re.compile(r'_(.*?)_')),         # Italic alternative
+    ('`', re.compile(r'`(.*?)`')),         # Code
+]
+_BULLET_RE = re.compile(r'^\s*[-•*]\s+', re.MULTILINE)
+_NUMBERING_RE = re.compile(r'^\s*\d+\.\s+', re.MULTILINE)
+
+# Compile one whole-word pattern matching any of the terms, longest first
+# Takes a tuple so the compiled pattern is cached per term list
+@functools.lru_cache(maxsize=None)
+def any_word_re(terms):
+    return re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r')\b')
+
+# Compile a case-insensitive pattern matching any of the keywords anywhere in the text
+# Equivalent to any(word in text.lower() for word in keywords) in a single scan
+def any_keyword_re(keywords):
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+# Keyword groups used by calculate_scores
+_LEADERSHIP_RE = any_keyword_re(["led", "managed", "directed", "leadership", "head", "team lead",
+                                 "supervisor", "manager", "chief", "director", "lead"])
+_PARTIAL_LEADERSHIP_RE = any_keyword_re(["coordinated", "facilitated", "organized", "spearheaded", "guided"])
+_INTERNATIONAL_RE = any_keyword_re(["yes", "international", "global", "worldwide", "multinational",
+                                    "cross-border", "overseas", "remote teams", "offshore"])
+_DEEP_INTERNATIONAL_RE = any_keyword_re(["led international", "managed global", "cross-cultural", "multiple countries"])
+_PREMIUM_COMPETITOR_RE = any_keyword_re(["anaplan", "workday", "oracle", "sap", "onestream"])
+
+# Keyword groups used to normalize parsed fields
+_INTERNATIONAL_YES_RE = any_keyword_re(["yes", "has", "worked", "experience"])
+_INTERNATIONAL_NO_RE = any_keyword_re(["no", "not", "none"])
+_MISSING_VALUE_RE = any_keyword_re(["not available", "not found", "not mentioned"])
+
+# List of common technical skills to check for
+COMMON_SKILLS = [
+    "python", "java", "javascript", "c++", "c#", ".net", "php", "ruby", "swift",
+    "sql", "mysql", "postgresql", "mongodb", "oracle", "database", 
+    "aws", "azure", "gcp", "cloud", "docker", "kubernetes", "devops",
+    "html", "css", "react", "angular", "vue", "node.js", "django",
+    "machine learning", "ai", "data science", "tensorflow", "pytorch",
+    "excel", "powerbi", "tableau", "power bi", "data visualization",
+    "agile", "scrum", "jira", "project management", "pmp",
+    "linux", "unix", "windows", "git", "github", "gitlab",
+    "api", "rest", "graphql", "microservices", "serverless",
+    # Common business and finance skills
+    "financial analysis", "budgeting", "forecasting", "accounting",
+    "strategic planning", "business development", "marketing", "sales",
+    "customer relationship management", "crm", "sap", "erp",
+    # Common soft skills
+    "communication", "leadership", "teamwork", "problem solving",
+    "critical thinking", "time management", "organization"
+]
+
+# Define related skills (skills that are similar or related to each other)
+RELATED_SKILLS = {
+    "python": ["django", "flask", "pandas", "numpy", "data science", "machine learning", "AI"],
+    "java": ["spring", "hibernate", "j2ee", "android"],
+    "javascript": ["typescript", "node.js", "react", "angular", "vue", "front-end"],
+    "sql": ["mysql", "postgresql", "oracle", "database", "data analysis"],
+    "aws": ["cloud", "azure", "gcp", "devops", "infrastructure"],
+    "docker": ["kubernetes", "containers", "devops", "microservices"],
+    "tableau": ["power bi", "data visualization", "analytics", "reporting"],
+    "excel": ["spreadsheets", "data analysis", "financial modeling"],
+    "agile": ["scrum", "kanban", "jira", "project management"],
+    "machine learning": ["ai", "data science", "deep learning", "nlp"],
+}
+
+# Skills related to each skill in either direction, so a relationship check is one set lookup
+_RELATED_SKILLS_INDEX = {
+    skill: set(RELATED_SKILLS.get(skill, [])) | {parent for parent, related in RELATED_SKILLS.items() if skill in related}
+    for skill in set(RELATED_SKILLS) | {related_skill for related in RELATED_SKILLS.values() for related_skill in related}
+}
+
+# Single whole-word pattern over every common and related skill, longest first
+# No skill contains or overlaps another at a word boundary, so one non-overlapping scan finds the same
+# skills as searching for each separately; keep it that way when adding skills
+_SKILL_VOCABULARY = sorted(set(COMMON_SKILLS) | {skill.lower() for skills in RELATED_SKILLS.values() for skill in skills},
+                           key=len, reverse=True)
+_SKILLS_RE = re.compile(r'\b(?:' + '|'.join(re.escape(skill) for skill in _SKILL_VOCABULARY) + r')\b')
+
+# Definition of expected analysis fields with exact matches and alternative formats
+ANALYSIS_FIELDS = {
+    "Candidate Name": ["candidate name", "candidate's name", "name"],
+    "Total Experience (Years)": ["total experience (years)", "total experience", "experience (years)", "years of experience"],
+    "Relevancy Score (0-100)": ["relevancy score (0-100)", "relevancy score", "relevance score"],
+    "Strong Matches Score": ["strong matches score", "strong match score", "strong matches"],
+    "Strong Matches Reasoning": ["strong matches reasoning", "strong match reasoning"],
+    "Partial Matches Score": ["partial matches score", "partial match score", "partial matches"],
+    "Partial Matches Reasoning": ["partial matches reasoning", "partial match reasoning"],
+    "All Tech Skills": ["all tech skills", "all technical skills"],
+    "Relevant Tech Skills": ["relevant tech skills", "relevant technical skills"],
+    "Degree": ["degree", "highest degree", "qualification"],
+    "College/University": ["college/university", "university", "college", "institution"],
+    "Job Applying For": ["job applying for", "job id", "position applying for", "role applying for"],
+    "College Rating": ["college rating", "university rating", "institution rating"],
+    "Job Stability": ["job stability", "employment stability"],
+    "Latest Company": ["latest company", "current company", "most recent company"],
+    "Leadership Skills": ["leadership skills", "leadership experience", "leadership"],
+    "International Team Experience": ["international team experience", "global team experience", "international experience"],
+    "Notice Period": ["notice period", "joining availability", "availability to join"],
+    "LinkedIn URL": ["linkedin url", "linkedin profile", "linkedin", "linkedin link"],
+    "Portfolio URL": ["portfolio url", "portfolio", "github url", "github", "personal website", "personal url", "website"],
+    "Work History": ["work history", "employment history", "companies worked for", "previous companies"],
+    "Competitor Experience": ["competitor experience", "worked for competitor", "competitor", "competition experience"],
+}
+
+# Fields reduced to a bare number when parsed
+_NUMERIC_FIELDS = frozenset(["Total Experience (Years)", "Relevancy Score (0-100)", "Strong Matches Score",
+                             "Partial Matches Score", "Job Stability"])
+
+# Field values treated as missing, for text fields and for the scores that trigger the fallback calculation
+_MISSING_FIELD_VALUES = frozenset(["Not Available", ""])
+_MISSING_SCORE_VALUES = frozenset(["Not Available", "0"])
+
+# Lookup from each lowercase alternative label to its field
+# Built in reverse so the first field listing a label wins, as in a front-to-back scan
+_FIELD_BY_ALTERNATIVE = {alternative: field for field, alternatives in reversed(ANALYSIS_FIELDS.items()) for alternative in alternatives}
+
+# Lines starting with a known field label, capturing the label and the rest of the line after the colon
+# Labels are checked against _FIELD_BY_ALTERNATIVE after matching, so str.lower() still decides what counts
+_FIELD_LINE_RE = re.compile(r'^[^\S\n]*(' + '|'.join(re.escape(alternative) for alternative in sorted(_FIELD_BY_ALTERNATIVE, key=len, reverse=True))
+                            + r')[^\S\n]*:(.*)$', re.IGNORECASE | re.MULTILINE)
+
+# Cache of AI responses keyed on resume/JD content hashes, shared across reruns and sessions
+@st.cache_resource(show_spinner=False)
+def get_analysis_cache():
+    return TTLCache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS), threading.Lock()
+
+# Build the analysis cache key from the resume and job description contents
+def analysis_cache_key(resume_text, job_description):
+    content = resume_text.encode() + b"\0" + job_description.encode()
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+# Initialize async AI client so resumes can be analyzed concurrently
+# The HTTP/2 connection pool is sized to the concurrency limit so every in-flight request reuses a warm connection
+# Created per analysis run rather than cached, since an async client is tied to the event loop that first uses it
+def initialize_groq_client(pool_size=DEFAULT_POOL_SIZE):
     try:
-        return Groq(api_key=os.environ.get("GROQ_API_KEY"))
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(GROQ_TIMEOUT_SECONDS, connect=GROQ_CONNECT_TIMEOUT_SECONDS)
+        )
+        # The SDK's own retries are disabled so every 429 reaches the adaptive limiter; process_batch_async
+        # retries rate limits and the other transient failures the SDK would have retried
+        return AsyncGroq(api_key=os.environ.get("GROQ_API_KEY"), http_client=http_client, max_retries=0)
     except Exception as e:
         st.error(f"Failed to initialize Groq client: {str(e)}")
         return None
 
-# Extract text from PDF
-def extract_text_from_pdf(pdf_file):
-    try:
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        text = "\n".join([page.extract_text() for page in pdf_reader.pages if page.extract_text()])
-        return text if text else None
-    except Exception as e:
-        st.error(f"Error extracting text from PDF: {str(e)}")
-        return None
+# Cache of extracted resume text keyed on PDF content hashes, shared across reruns and sessions
+@st.cache_resource(show_spinner=False)
+def get_extraction_cache():
+    return TTLCache(maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS), threading.Lock()
+
+# Pick the executor for a batch: PDF parsing is CPU-bound, so uploads with a lot of PDF data go to
+# worker processes to use every core; everything else stays on threads to avoid process startup cost
+# Spawn (not fork) keeps workers clear of the Streamlit server's threads
+def create_extraction_executor(file_count, total_bytes):
+    if total_bytes > PROCESS_POOL_MIN_BYTES:
+        return ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, file_count),
+                                   mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(max_workers=PDF_EXTRACTION_WORKERS)
+
+# Extract all uploaded PDFs, returning results in upload order
+# Previously extracted files are served from the cache; only the rest are sent to the executor
+# on_progress is called from the calling thread as each file finishes
+def extract_pdfs_concurrently(uploaded_files, on_progress=None):
+    extractions = [None] * len(uploaded_files)
+    extraction_cache, cache_lock = get_extraction_cache()
+    pending = {}
+    completed = 0
+    for i, uploaded_file in enumerate(uploaded_files):
+        pdf_bytes = uploaded_file.getvalue()
+        cache_key = hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+        with cache_lock:
+            resume_text = extraction_cache.get(cache_key)
+        if resume_text:
+            extractions[i] = {"file_name": uploaded_file.name, "resume_text": resume_text, "error": None, "extraction_time": 0.0}
+            completed += 1
+        else:
+            pending[i] = (uploaded_file.name, pdf_bytes, cache_key)
+    if on_progress and completed:
+        on_progress(completed)
+    if not pending:
+        return extractions
+    total_bytes = sum(len(pdf_bytes) for _, pdf_bytes, _ in pending.values())
+    with create_extraction_executor(len(pending), total_bytes) as executor:
+        futures = {executor.submit(extract_pdf_for_batch, file_name, pdf_bytes): i
+                   for i, (file_name, pdf_bytes, _) in pending.items()}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                extractions[i] = future.result()
+            except Exception as e:
+                # A worker process crashing (e.g. on a malformed PDF) surfaces here rather than in extract_pdf_for_batch
+                extractions[i] = {"file_name": pending[i][0], "resume_text": None,
+                                  "error": f"Error extracting text from PDF: {str(e)}", "extraction_time": 0.0}
+            if extractions[i]["resume_text"]:
+                with cache_lock:
+                    extraction_cache[pending[i][2]] = extractions[i]["resume_text"]
+            completed += 1
+            if on_progress:
+                on_progress(completed)
+    return extractions
 
 # Define Planful competitors
+# Built once and returned as a tuple so callers share it without being able to mutate it
+@functools.lru_cache(maxsize=1)
 def get_planful_competitors():
-    return [
+    return (
         "Anaplan", "Workday Adaptive Planning", "Oracle EPM", "Oracle Hyperion", 
         "SAP BPC", "IBM Planning Analytics", "TM1", "Prophix", "Vena Solutions", 
         "Jedox", "OneStream", "Board", "Centage", "Solver", "Kepion", "Host Analytics",
         "CCH Tagetik", "Infor CPM", "Syntellis", "Longview"
-    ]
+    )
+
+# Lowercase a tuple of names once, so matching loops don't re-lowercase every name for every resume
+@functools.lru_cache(maxsize=None)
+def lowercase_names(names):
+    return tuple(name.lower() for name in names)
+
+# The "Yes - [Company]" value reported for each competitor, built once per competitor list
+@functools.lru_cache(maxsize=None)
+def competitor_labels(competitors):
+    return tuple(f"Yes - {competitor}" for competitor in competitors)
+
+# Remove trailing punctuation and whitespace picked up after a URL
+# Scans back from the end instead of using a `[...]+$` regex, which is quadratic on long punctuation runs
+def strip_trailing_url_punctuation(url):
+    end = len(url)
+    while end and (url[end - 1] in ".,;:)" or url[end - 1].isspace()):
+        end -= 1
+    return url[:end]
 
 # Extract LinkedIn URL directly from resume text
 def extract_linkedin_url(text):
     if not text:
         return ""
     
-    patterns = [
-        r'https?://(?:www\.)?linkedin\.com/in/[\w-]+(?:/[\w-]+)*',
-        r'linkedin\.com/in/[\w-]+(?:/[\w-]+)*',
-        r'www\.linkedin\.com/in/[\w-]+(?:/[\w-]+)*',
-        r'linkedin:\s*https?://(?:www\.)?linkedin\.com/in/[\w-]+',
-    ]
+    # Bound the scan on pathological inputs; real resumes are far shorter
+    text = text[:MAX_URL_SCAN_CHARS]
+    
+    # Every pattern below needs the word "linkedin", so one literal scan rules most resumes out early
+    if not _LINKEDIN_WORD_RE.search(text):
+        return ""
     
-    for pattern in patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            url = matches[0]
+    # Patterns are tried in priority order; search stops at the first hit instead of collecting every match
+    for pattern in _LINKEDIN_URL_RES:
+        match = pattern.search(text)
+        if match:
+            url = match.group(0)
             if not url.startswith('http'):
                 url = 'https://' + ('' if url.startswith('www.') or url.startswith('linkedin.com') else 'www.') + url
                 if url.startswith('https://linkedin.com'):
                     url = url.replace('https://linkedin.com', 'https://www.linkedin.com')
-            url = re.sub(r'[.,;:)\s]+$', '', url)
+            url = strip_trailing_url_punctuation(url)
             return url
     
-    linkedin_mention = re.search(r'linkedin[\s:]*([^\s]+)', text, re.IGNORECASE)
+    linkedin_mention = _LINKEDIN_MENTION_RE.search(text)
     if linkedin_mention:
         potential_url = linkedin_mention.group(1)
         if '.' in potential_url and '/' in potential_url:
-            url = re.sub(r'[.,;:)\s]+$', '', potential_url)
+            url = strip_trailing_url_punctuation(potential_url)
             if not url.startswith('http'):
                 url = 'https://' + ('' if url.startswith('www.') else 'www.') + url
             return url
     
     return ""
 
+# Convert a parsed field to a float, or None when it isn't numeric
+def to_float(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+# Reduce a parsed field to the first number in it, leaving it unchanged when there is none
+# Values that are already a bare number like "72" or "3.5" are returned without running the regex
+def first_number(value):
+    whole, dot, fraction = value.partition('.')
+    if whole.isdecimal() and (not dot or fraction.isdecimal()):
+        return value
+    matches = _NUMBER_RE.search(value)
+    return matches.group(1) if matches else value
+
 # Calculate the individual scores and overall score based on the improved algorithm
 def calculate_scores(parsed_data, required_experience=3, stability_threshold=2):
     try:
         scores = {}
         
         # Strong Matches Score - direct from the AI analysis of exact skill matches
-        strong_matches_val = parsed_data.get("Strong Matches Score", "0")
-        try:
-            scores["strong_matches"] = float(strong_matches_val)
-        except (ValueError, TypeError):
-            scores["strong_matches"] = 0
+        strong_matches = to_float(parsed_data.get("Strong Matches Score", "0"))
+        scores["strong_matches"] = strong_matches if strong_matches is not None else 0
             
         # Partial Matches Score - direct from the AI analysis of related skills
-        partial_matches_val = parsed_data.get("Partial Matches Score", "0")
-        try:
-            scores["partial_matches"] = float(partial_matches_val)
-        except (ValueError, TypeError):
-            scores["partial_matches"] = 0
+        partial_matches = to_float(parsed_data.get("Partial Matches Score", "0"))
+        scores["partial_matches"] = partial_matches if partial_matches is not None else 0
             
         # Calculate relevancy score as a weighted sum of strong and partial matches
         # Give more weight to strong matches (70%) than partial matches (30%)
@@ -103,50 +400,47 @@ def calculate_scores(parsed_data, required_experience=3, stability_threshold=2):
         parsed_data["Relevancy Score (0-100)"] = str(round(scores["relevancy"], 1))
         
         # Experience calculation - based on required years
-        experience_val = parsed_data.get("Total Experience (Years)", "0")
-        try:
-            candidate_exp = float(experience_val)
-            # More nuanced experience score:
-            # - Below required: proportional score up to 70%
-            # - At required: 80%
-            # - Above required: bonus points up to 100%
-            if candidate_exp < required_experience:
-                scores["experience"] = min((candidate_exp / required_experience) * 70, 70)
-            elif candidate_exp == required_experience:
-                scores["experience"] = 80
-            else:
-                # Additional experience gives bonus points, with diminishing returns
-                bonus = min(((candidate_exp - required_experience) / 2) * 20, 20)
-                scores["experience"] = 80 + bonus
-        except (ValueError, TypeError):
+        candidate_exp = to_float(parsed_data.get("Total Experience (Years)", "0"))
+        # More nuanced experience score:
+        # - Below required: proportional score up to 70%
+        # - At required: 80%
+        # - Above required: bonus points up to 100%
+        if candidate_exp is None:
             scores["experience"] = 0
+        elif candidate_exp < required_experience:
+            scores["experience"] = min((candidate_exp / required_experience) * 70, 70)
+        elif candidate_exp == required_experience:
+            scores["experience"] = 80
+        else:
+            # Additional experience gives bonus points, with diminishing returns
+            bonus = min(((candidate_exp - required_experience) / 2) * 20, 20)
+            scores["experience"] = 80 + bonus
             
         # Job stability - how long candidates typically stay at jobs
-        stability_val = parsed_data.get("Job Stability", "0")
-        try:
-            job_stability = float(stability_val)
-            if job_stability <= 10:  # If rated on 1-10 scale
-                scores["stability"] = job_stability * 10  # Convert to 100-point scale
-            else:  # If provided as average years
-                # Convert years to score: 
-                # - Less than 1 year: proportional score up to 50
-                # - 1-2 years: 50-85
-                # - 2+ years: 85-100
-                if job_stability < 1:
-                    scores["stability"] = (job_stability * 50)
-                elif job_stability < 2:
-                    scores["stability"] = 50 + ((job_stability - 1) * 35)
-                else:
-                    scores["stability"] = 85 + min(((job_stability - 2) * 7.5), 15)
-        except (ValueError, TypeError):
+        job_stability = to_float(parsed_data.get("Job Stability", "0"))
+        if job_stability is None:
             scores["stability"] = 0
+        elif job_stability <= 10:  # If rated on 1-10 scale
+            scores["stability"] = job_stability * 10  # Convert to 100-point scale
+        else:  # If provided as average years
+            # Convert years to score: 
+            # - Less than 1 year: proportional score up to 50
+            # - 1-2 years: 50-85
+            # - 2+ years: 85-100
+            if job_stability < 1:
+                scores["stability"] = (job_stability * 50)
+            elif job_stability < 2:
+                scores["stability"] = 50 + ((job_stability - 1) * 35)
+            else:
+                scores["stability"] = 85 + min(((job_stability - 2) * 7.5), 15)
             
         # College rating score
         college_rating = parsed_data.get("College Rating", "")
         if college_rating:
-            if "premium" in college_rating.lower() and "non" not in college_rating.lower():
+            college_rating_lower = college_rating.lower()
+            if "premium" in college_rating_lower and "non" not in college_rating_lower:
                 scores["college"] = 100
-            elif "non-premium" in college_rating.lower():
+            elif "non-premium" in college_rating_lower:
                 scores["college"] = 70
             else:
                 scores["college"] = 40
@@ -156,15 +450,11 @@ def calculate_scores(parsed_data, required_experience=3, stability_threshold=2):
         # Leadership score - based on presence of leadership experience
         leadership_skills = parsed_data.get("Leadership Skills", "")
         if leadership_skills:
-            leadership_keywords = ["led", "managed", "directed", "leadership", "head", "team lead", 
-                                "supervisor", "manager", "chief", "director", "lead"]
-            
-            if any(word in leadership_skills.lower() for word in leadership_keywords):
+            if _LEADERSHIP_RE.search(leadership_skills):
                 scores["leadership"] = 100
             else:
                 # Check for partial leadership indicators
-                partial_leadership = ["coordinated", "facilitated", "organized", "spearheaded", "guided"]
-                if any(word in leadership_skills.lower() for word in partial_leadership):
+                if _PARTIAL_LEADERSHIP_RE.search(leadership_skills):
                     scores["leadership"] = 50
                 else:
                     scores["leadership"] = 0
@@ -174,13 +464,9 @@ def calculate_scores(parsed_data, required_experience=3, stability_threshold=2):
         # International experience score
         international_exp = parsed_data.get("International Team Experience", "")
         if international_exp:
-            international_keywords = ["yes", "international", "global", "worldwide", "multinational", 
-                                    "cross-border", "overseas", "remote teams", "offshore"]
-            
-            if any(word in international_exp.lower() for word in international_keywords):
+            if _INTERNATIONAL_RE.search(international_exp):
                 # Look for deeper international experience
-                deep_int_exp = ["led international", "managed global", "cross-cultural", "multiple countries"]
-                if any(phrase in international_exp.lower() for phrase in deep_int_exp):
+                if _DEEP_INTERNATIONAL_RE.search(international_exp):
                     scores["international"] = 100
                 else:
                     scores["international"] = 80
@@ -193,8 +479,7 @@ def calculate_scores(parsed_data, required_experience=3, stability_threshold=2):
         competitor_exp = parsed_data.get("Competitor Experience", "")
         if competitor_exp and competitor_exp.lower().startswith("yes"):
             # Premium competitors get higher scores
-            premium_competitors = ["anaplan", "workday", "oracle", "sap", "onestream"]
-            if any(comp in competitor_exp.lower() for comp in premium_competitors):
+            if _PREMIUM_COMPETITOR_RE.search(competitor_exp):
                 scores["competitor"] = 100
             else:
                 scores["competitor"] = 70
@@ -228,27 +513,17 @@ def calculate_scores(parsed_data, required_experience=3, stability_threshold=2):
     
     except Exception as e:
         st.error(f"Error calculating scores: {str(e)}")
-        import traceback
-        st.error(traceback.format_exc())
+        show_traceback()
         return 0, "Error in calculation", {}
 
-# Analyze resume with detailed skill matching
-def analyze_resume(client, resume_text, job_description):
-    if not client:
-        return None
-        
+# Output format and scoring rules shared by the single and batched analysis prompts
+# The text is static, so it is formatted once per run rather than for every batch; Streamlit re-executes this script, and so rebuilds the cache, on each rerun
+@functools.lru_cache(maxsize=1)
+def get_analysis_instructions():
     competitors = get_planful_competitors()
     competitors_list = ", ".join(competitors)
     
-    # This prompt is focused on detailed skill extraction and matching
-    prompt = f"""
-    You are an experienced HR Consultant analyzing a candidate resume against a job description for a technical role.
-    Your task is to carefully identify skills and match them between the job description and resume.
-
-    First, extract a comprehensive list of ALL required skills, qualifications, and technologies from the job description.
-    Then thoroughly analyze the resume to identify skills that exactly match or are related to the job requirements.
-
-    Provide your analysis in the following format:
+    return f"""Provide your analysis in the following format:
 
     Candidate Name: [Full name from resume]
     Total Experience (Years): [Total years of professional experience]
@@ -282,60 +557,154 @@ def analyze_resume(client, resume_text, job_description):
     - For Partial Matches Score: Count related/transferable skills, evaluate relevance (50-80% per skill), average them
     - A score of 0 should ONLY be given if absolutely NO matches are found
     - Be generous with partial matches - if a skill is conceptually related, count it
-    - Do not artificially deflate scores - real-world recruitment values transferable skills
+    - Do not artificially deflate scores - real-world recruitment values transferable skills"""
+
+# System message shared by the single and batched analysis calls
+ANALYSIS_SYSTEM_MESSAGE = "You are an expert HR consultant with years of technical recruitment experience. Your specialty is identifying transferable skills between different technologies and roles."
+
+# Build the analysis prompt around the parts that don't change within a batch
+# The instructions and job description are formatted once; each call only splices in the resume text
+def make_prompt_builder(job_description):
+    # This prompt is focused on detailed skill extraction and matching
+    prompt_head = f"""
+    You are an experienced HR Consultant analyzing a candidate resume against a job description for a technical role.
+    Your task is to carefully identify skills and match them between the job description and resume.
+
+    First, extract a comprehensive list of ALL required skills, qualifications, and technologies from the job description.
+    Then thoroughly analyze the resume to identify skills that exactly match or are related to the job requirements.
+
+    {get_analysis_instructions()}
 
     Resume:
-    {resume_text}
+    """
+    prompt_tail = f"""
 
     Job Description:
     {job_description}
     """
+    return lambda resume_text: prompt_head + resume_text + prompt_tail
+
+# Analyze resume with detailed skill matching
+async def analyze_resume_async(client, resume_text, prompt_builder):
+    if not client:
+        return None
+        
+    prompt = prompt_builder(resume_text)
+    
+    # Errors propagate to the caller, which reports them once the task completes
+    # Track time for API call
+    api_call_start = time.time()
+    
+    response = await client.chat.completions.create(
+        model="mixtral-8x7b-32768",
+        messages=[
+            {"role": "system", "content": ANALYSIS_SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,  # Lower temperature for consistent analysis
+        max_tokens=ANALYSIS_MAX_TOKENS   # Increased to allow for detailed analysis
+    )
+    
+    # Calculate API call time
+    api_call_time = time.time() - api_call_start
     
+    ai_response = response.choices[0].message.content
+    
+    # Add API call time to the response for later use
+    ai_response = f"API call time: {api_call_time:.2f} seconds\n\n" + ai_response
+    
+    return ai_response
+
+# Build the prompt for analyzing several resumes in one call, each wrapped in a numbered <RESUME_i> tag
+def build_batch_prompt(resume_texts, job_description):
+    tagged_resumes = "".join(f"<RESUME_{i}>\n{text}\n</RESUME_{i}>\n" for i, text in enumerate(resume_texts))
+    
+    return f"""
+    You are an experienced HR Consultant analyzing {len(resume_texts)} candidate resumes against the same job description for a technical role.
+    Your task is to carefully identify skills and match them between the job description and each resume.
+
+    First, extract a comprehensive list of ALL required skills, qualifications, and technologies from the job description.
+    Then thoroughly analyze each resume independently to identify skills that exactly match or are related to the job requirements.
+
+    {get_analysis_instructions()}
+
+    Respond with a JSON object of the form {{"analyses": [{{"resume_index": 0, "analysis": "..."}}]}} containing exactly one entry per resume,
+    where resume_index is the number in the resume's <RESUME_i> tag and analysis is the full analysis text in the format above.
+
+    Job Description:
+    {job_description}
+
+    Resumes:
+    {tagged_resumes}
+    """
+
+# Analyze several resumes in one API call so the job description and request overhead are paid once
+# Returns one analysis per resume (None where the model omitted one or returned it malformed), each in the single-resume text format
+async def analyze_resumes_batch_async(client, resume_texts, job_description):
+    if not client:
+        return [None] * len(resume_texts)
+    
+    prompt = build_batch_prompt(resume_texts, job_description)
+    
+    api_call_start = time.time()
+    
+    response = await client.chat.completions.create(
+        model="mixtral-8x7b-32768",
+        messages=[
+            {"role": "system", "content": ANALYSIS_SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=ANALYSIS_MAX_TOKENS * len(resume_texts),
+        response_format={"type": "json_object"},
+        # The response grows with the number of resumes, so the read timeout does too
+        timeout=httpx.Timeout(GROQ_TIMEOUT_SECONDS * len(resume_texts), connect=GROQ_CONNECT_TIMEOUT_SECONDS)
+    )
+    
+    # Attribute an equal share of the call time to each resume so per-resume metrics stay comparable
+    api_call_time = (time.time() - api_call_start) / len(resume_texts)
+    
+    # Invalid or truncated JSON, or a payload of the wrong shape, leaves every resume without an analysis
     try:
-        # Track time for API call
-        api_call_start = time.time()
-        
-        response = client.chat.completions.create(
-            model="mixtral-8x7b-32768",
-            messages=[
-                {"role": "system", "content": "You are an expert HR consultant with years of technical recruitment experience. Your specialty is identifying transferable skills between different technologies and roles."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,  # Lower temperature for consistent analysis
-            max_tokens=3500   # Increased to allow for detailed analysis
-        )
-        
-        # Calculate API call time
-        api_call_time = time.time() - api_call_start
-        
-        ai_response = response.choices[0].message.content
+        payload = json.loads(response.choices[0].message.content)
+    except (TypeError, ValueError):
+        payload = {}
+    entries = payload.get("analyses") if isinstance(payload, dict) else None
+    
+    analyses = [None] * len(resume_texts)
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or not isinstance(entry.get("analysis"), str):
+            continue
+        index = entry.get("resume_index")
+        if type(index) is int and 0 <= index < len(analyses) and entry["analysis"]:
+            analyses[index] = f"API call time: {api_call_time:.2f} seconds\n\n" + entry["analysis"]
+    return analyses
+
+# Show the stack trace for the exception being handled, only when debugging is switched on
+# Formatting and rendering every trace is wasted work when a batch of malformed responses fails
+def show_traceback():
+    if st.session_state.get("debug", False):
+        st.error(traceback.format_exc())
+
+# Show raw AI output for troubleshooting
+def show_analysis_debug(ai_response, api_call_time):
+    with st.expander("AI Analysis (Debug)", expanded=False):
+        st.write(f"API call time: {api_call_time:.2f} seconds")
+        st.write(ai_response[:500] + "..." if len(ai_response) > 500 else ai_response)
         
-        # Add API call time to the response for later use
-        ai_response = f"API call time: {api_call_time:.2f} seconds\n\n" + ai_response
+        # Check for score mentions in the response
+        strong_score_match = _DEBUG_STRONG_SCORE_RE.search(ai_response)
+        partial_score_match = _DEBUG_PARTIAL_SCORE_RE.search(ai_response)
         
-        # Debug info to see raw output for troubleshooting
-        with st.expander("AI Analysis (Debug)", expanded=False):
-            st.write(f"API call time: {api_call_time:.2f} seconds")
-            st.write(ai_response[:500] + "..." if len(ai_response) > 500 else ai_response)
-            
-            # Check for score mentions in the response
-            strong_score_match = re.search(r'Strong Matches Score:?\s*(\d+)', ai_response)
-            partial_score_match = re.search(r'Partial Matches Score:?\s*(\d+)', ai_response)
+        if strong_score_match:
+            st.write(f"✅ Strong Matches Score detected: {strong_score_match.group(1)}")
+        else:
+            st.write("❌ Strong Matches Score not found in response")
             
-            if strong_score_match:
-                st.write(f"✅ Strong Matches Score detected: {strong_score_match.group(1)}")
-            else:
-                st.write("❌ Strong Matches Score not found in response")
-                
-            if partial_score_match:
-                st.write(f"✅ Partial Matches Score detected: {partial_score_match.group(1)}")
-            else:
-                st.write("❌ Partial Matches Score not found in response")
-        
-        return ai_response
-    except Exception as e:
-        st.error(f"Error during analysis: {str(e)}")
-        return None
+        if partial_score_match:
+            st.write(f"✅ Partial Matches Score detected: {partial_score_match.group(1)}")
+        else:
+            st.write("❌ Partial Matches Score not found in response")
 
 # Clean text by removing formatting
 def clean_text(text):
@@ -343,15 +712,16 @@ def clean_text(text):
         return text
         
     # Remove markdown formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)  # Bold
-    text = re.sub(r'\*(.*?)\*', r'\1', text)      # Italic
-    text = re.sub(r'__(.*?)__', r'\1', text)      # Underline
-    text = re.sub(r'_(.*?)_', r'\1', text)        # Italic alternative
-    text = re.sub(r'`(.*?)`', r'\1', text)        # Code
+    # Substitutions only delete characters, so a delimiter missing now can't appear in a later pass
+    for delimiter, pattern in _MARKDOWN_RES:
+        if delimiter in text:
+            text = pattern.sub(r'\1', text)
     
     # Remove bullet points and numbering
-    text = re.sub(r'^\s*[-•*]\s+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^\s*\d+\.\s+', '', text, flags=re.MULTILINE)
+    if '-' in text or '•' in text or '*' in text:
+        text = _BULLET_RE.sub('', text)
+    if '.' in text:
+        text = _NUMBERING_RE.sub('', text)
     
     return text.strip()
 
@@ -360,97 +730,122 @@ def check_competitor_experience(work_history, competitor_list):
     if not work_history or work_history == "Not Available":
         return ""
     
-    for competitor in competitor_list:
-        # Case-insensitive word boundary match
-        pattern = r'\b' + re.escape(competitor.lower()) + r'\b'
-        if re.search(pattern, work_history.lower()):
-            return f"Yes - {competitor}"
+    # Case-insensitive word boundary match, finding every competitor mentioned in one scan
+    # Competitor names don't overlap at word boundaries, so the non-overlapping scan misses none
+    competitors_lower = lowercase_names(tuple(competitor_list))
+    mentioned = set(any_word_re(competitors_lower).findall(work_history.lower()))
+    if not mentioned:
+        return ""
+    
+    # Report the first competitor in list order, as when each was searched for separately
+    for label, competitor_lower in zip(competitor_labels(tuple(competitor_list)), competitors_lower):
+        if competitor_lower in mentioned:
+            return label
     
     return ""
 
+# Normalize College Rating to "Premium" or "Non-Premium" when the AI says which
+def normalize_college_rating(college_rating):
+    college_rating_lower = college_rating.lower()
+    if "premium" in college_rating_lower:
+        return "Premium"
+    elif "non" in college_rating_lower or "not" in college_rating_lower:
+        return "Non-Premium"
+    return college_rating
+
+# Normalize International Team Experience, reducing bare yes/no answers to "Yes" or "No"
+def normalize_international_experience(international_exp):
+    if _INTERNATIONAL_YES_RE.search(international_exp):
+        if len(international_exp) < 5:  # Just "Yes" or similar
+            return "Yes"
+    elif _INTERNATIONAL_NO_RE.search(international_exp):
+        if len(international_exp) < 5:  # Just "No" or similar
+            return "No"
+    return international_exp
+
+# Normalizers for fields that only depend on their own value, applied when the field was found
+FIELD_NORMALIZERS = [
+    ("College Rating", normalize_college_rating),
+    ("International Team Experience", normalize_international_experience),
+]
+
+# Normalize Competitor Experience to "Yes - [Company]", or blank when no competitor is found
+def normalize_competitor_experience(competitor_exp, work_history):
+    if competitor_exp in _MISSING_FIELD_VALUES:
+        # Check work history for competitor names
+        return check_competitor_experience(work_history, get_planful_competitors())
+    
+    competitor_exp_lower = competitor_exp.lower()
+    if "no" in competitor_exp_lower or "not" in competitor_exp_lower:
+        # If explicitly states no, then make it empty
+        return ""
+    if competitor_exp_lower.startswith("yes"):
+        return competitor_exp
+    
+    # If doesn't start with "Yes" but has content, check if it's a competitor name
+    competitors = get_planful_competitors()
+    for label, competitor_lower in zip(competitor_labels(competitors), lowercase_names(competitors)):
+        if competitor_lower in competitor_exp_lower:
+            return label
+    return ""
+
+# Return the set of known skills mentioned in already-lowercased text
+def find_skills(text_lower):
+    return set(_SKILLS_RE.findall(text_lower))
+
+# Return the known skills a job description asks for, in COMMON_SKILLS order
+# Every resume in a batch is scored against the same job description, so it is lowercased and scanned once
+@functools.lru_cache(maxsize=16)
+def find_jd_skills(job_description):
+    jd_found = find_skills(job_description.lower())
+    return tuple(skill for skill in COMMON_SKILLS if skill in jd_found)
+
 # Improved calculate_skills_scores function with detailed reasoning
+# Deterministic in its inputs, so results are cached by content like the AI responses
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
 def calculate_skills_scores(resume_text, job_description):
     """
     Provides detailed reasoning for skill matches and scores when the AI fallback is used.
     Returns strong score, partial score, and detailed reasoning for both.
     """
-    # Normalize text for comparison
-    resume_lower = resume_text.lower()
-    jd_lower = job_description.lower()
-    
-    # List of common technical skills to check for
-    common_skills = [
-        "python", "java", "javascript", "c++", "c#", ".net", "php", "ruby", "swift",
-        "sql", "mysql", "postgresql", "mongodb", "oracle", "database", 
-        "aws", "azure", "gcp", "cloud", "docker", "kubernetes", "devops",
-        "html", "css", "react", "angular", "vue", "node.js", "django",
-        "machine learning", "ai", "data science", "tensorflow", "pytorch",
-        "excel", "powerbi", "tableau", "power bi", "data visualization",
-        "agile", "scrum", "jira", "project management", "pmp",
-        "linux", "unix", "windows", "git", "github", "gitlab",
-        "api", "rest", "graphql", "microservices", "serverless",
-        # Common business and finance skills
-        "financial analysis", "budgeting", "forecasting", "accounting",
-        "strategic planning", "business development", "marketing", "sales",
-        "customer relationship management", "crm", "sap", "erp",
-        # Common soft skills
-        "communication", "leadership", "teamwork", "problem solving",
-        "critical thinking", "time management", "organization"
-    ]
-    
-    # Define related skills (skills that are similar or related to each other)
-    related_skills = {
-        "python": ["django", "flask", "pandas", "numpy", "data science", "machine learning", "AI"],
-        "java": ["spring", "hibernate", "j2ee", "android"],
-        "javascript": ["typescript", "node.js", "react", "angular", "vue", "front-end"],
-        "sql": ["mysql", "postgresql", "oracle", "database", "data analysis"],
-        "aws": ["cloud", "azure", "gcp", "devops", "infrastructure"],
-        "docker": ["kubernetes", "containers", "devops", "microservices"],
-        "tableau": ["power bi", "data visualization", "analytics", "reporting"],
-        "excel": ["spreadsheets", "data analysis", "financial modeling"],
-        "agile": ["scrum", "kanban", "jira", "project management"],
-        "machine learning": ["ai", "data science", "deep learning", "nlp"],
-    }
+    # Find every known skill in the resume with one scan; the job description's skills are shared across resumes
+    resume_found = find_skills(resume_text.lower())
     
     # Find all skills mentioned in the job description
-    jd_skills = []
-    for skill in common_skills:
-        # Use word boundaries to ensure we're matching whole words
-        pattern = r'\b' + re.escape(skill) + r'\b'
-        if re.search(pattern, jd_lower):
-            jd_skills.append(skill)
+    jd_skills = find_jd_skills(job_description)
+    jd_skill_set = set(jd_skills)
     
     # Find exact matches in the resume
-    exact_matches = []
-    for skill in jd_skills:
-        pattern = r'\b' + re.escape(skill) + r'\b'
-        if re.search(pattern, resume_lower):
-            exact_matches.append(skill)
+    exact_matches = [skill for skill in jd_skills if skill in resume_found]
+    
+    exact_match_set = set(exact_matches)
     
     # Find related matches
     related_matches = []
     for jd_skill in jd_skills:
-        if jd_skill in exact_matches:
+        if jd_skill in exact_match_set:
             continue  # Skip if already an exact match
             
         # Check if any related skills are in the resume
-        if jd_skill in related_skills:
-            for related_skill in related_skills[jd_skill]:
-                pattern = r'\b' + re.escape(related_skill.lower()) + r'\b'
-                if re.search(pattern, resume_lower) and related_skill.lower() not in [match.lower() for match in exact_matches]:
-                    related_matches.append(f"{related_skill} (related to {jd_skill})")
+        for related_skill in RELATED_SKILLS.get(jd_skill, []):
+            related_skill_lower = related_skill.lower()
+            if related_skill_lower in resume_found and related_skill_lower not in exact_match_set:
+                related_matches.append(f"{related_skill} (related to {jd_skill})")
     
     # Additional resume skills that might be transferable
-    additional_resume_skills = []
-    for skill in common_skills:
-        if skill not in jd_skills:  # Don't include skills already counted
-            pattern = r'\b' + re.escape(skill) + r'\b'
-            if re.search(pattern, resume_lower):
-                for jd_skill in jd_skills:
-                    if skill in related_skills.get(jd_skill, []) or jd_skill in related_skills.get(skill, []):
-                        related_match = f"{skill} (transferable to {jd_skill})"
-                        if related_match not in related_matches:
-                            related_matches.append(related_match)
+    # A set mirrors related_matches so the duplicate check doesn't rescan the list
+    seen_matches = set(related_matches)
+    for skill in COMMON_SKILLS:
+        if skill not in jd_skill_set and skill in resume_found:  # Don't include skills already counted
+            related_to_skill = _RELATED_SKILLS_INDEX.get(skill)
+            if not related_to_skill:
+                continue
+            for jd_skill in jd_skills:
+                if jd_skill in related_to_skill:
+                    related_match = f"{skill} (transferable to {jd_skill})"
+                    if related_match not in seen_matches:
+                        seen_matches.add(related_match)
+                        related_matches.append(related_match)
     
     # Calculate scores
     if not jd_skills:  # No skills found in JD
@@ -499,118 +894,59 @@ def calculate_skills_scores(resume_text, job_description):
     return round(strong_score), round(partial_score), strong_reasoning, partial_reasoning
 
 # Parse AI response with improved extraction logic
+# Cached so re-analyzing unchanged resumes skips parsing and scoring
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS)
 def parse_analysis(analysis, resume_text=None, job_description=None):
     try:
         if not analysis:
             return None
             
-        # Definition of expected fields with exact matches and alternative formats
-        expected_fields = {
-            "Candidate Name": ["candidate name", "candidate's name", "name"],
-            "Total Experience (Years)": ["total experience (years)", "total experience", "experience (years)", "years of experience"],
-            "Relevancy Score (0-100)": ["relevancy score (0-100)", "relevancy score", "relevance score"],
-            "Strong Matches Score": ["strong matches score", "strong match score", "strong matches"],
-            "Strong Matches Reasoning": ["strong matches reasoning", "strong match reasoning"],
-            "Partial Matches Score": ["partial matches score", "partial match score", "partial matches"],
-            "Partial Matches Reasoning": ["partial matches reasoning", "partial match reasoning"],
-            "All Tech Skills": ["all tech skills", "all technical skills"],
-            "Relevant Tech Skills": ["relevant tech skills", "relevant technical skills"],
-            "Degree": ["degree", "highest degree", "qualification"],
-            "College/University": ["college/university", "university", "college", "institution"],
-            "Job Applying For": ["job applying for", "job id", "position applying for", "role applying for"],
-            "College Rating": ["college rating", "university rating", "institution rating"],
-            "Job Stability": ["job stability", "employment stability"],
-            "Latest Company": ["latest company", "current company", "most recent company"],
-            "Leadership Skills": ["leadership skills", "leadership experience", "leadership"],
-            "International Team Experience": ["international team experience", "global team experience", "international experience"],
-            "Notice Period": ["notice period", "joining availability", "availability to join"],
-            "LinkedIn URL": ["linkedin url", "linkedin profile", "linkedin", "linkedin link"],
-            "Portfolio URL": ["portfolio url", "portfolio", "github url", "github", "personal website", "personal url", "website"],
-            "Work History": ["work history", "employment history", "companies worked for", "previous companies"],
-            "Competitor Experience": ["competitor experience", "worked for competitor", "competitor", "competition experience"],
-        }
-        
         # Create a dictionary to store the extracted values
-        result = {field: "Not Available" for field in expected_fields}
-        
-        # Split the AI output into lines for processing
-        lines = analysis.split('\n')
+        result = {field: "Not Available" for field in ANALYSIS_FIELDS}
         
         # First pass: direct pattern matching for scores
         # This has higher priority because we want to ensure we catch these values
-        strong_match = re.search(r'Strong Matches Score:?\s*(\d+(?:\.\d+)?)', analysis)
+        strong_match = _STRONG_SCORE_RE.search(analysis)
         if strong_match:
             result["Strong Matches Score"] = strong_match.group(1)
             
-        partial_match = re.search(r'Partial Matches Score:?\s*(\d+(?:\.\d+)?)', analysis)
+        partial_match = _PARTIAL_SCORE_RE.search(analysis)
         if partial_match:
             result["Partial Matches Score"] = partial_match.group(1)
         
+        # Save a field's accumulated lines, reducing numeric fields to their first number as they are stored
+        def store_field(field, value_lines):
+            value = '\n'.join(value_lines)
+            result[field] = first_number(value) if field in _NUMERIC_FIELDS else value
+        
         # Second pass: structured field extraction
-        current_field = None
-        current_value = []
+        # Find every field line in one scan; everything up to the next field line continues its value
+        field_lines = []
+        for match in _FIELD_LINE_RE.finditer(analysis):
+            field = _FIELD_BY_ALTERNATIVE.get(match.group(1).lower())
+            if field:
+                field_lines.append((match, field))
         
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:  # Skip empty lines
-                continue
-                
-            # Check if this line starts a new field
-            new_field_found = False
-            
-            if ':' in line:
-                parts = line.split(':', 1)
-                key = parts[0].strip().lower()
-                value = parts[1].strip()
-                
-                # Check if this matches any of our expected fields
-                for field, alternatives in expected_fields.items():
-                    if key in alternatives:
-                        # If we were building a previous field value, save it
-                        if current_field and current_value:
-                            result[current_field] = '\n'.join(current_value)
-                            
-                        # Start the new field
-                        current_field = field
-                        current_value = [value] if value else []
-                        new_field_found = True
-                        break
+        for i, (match, field) in enumerate(field_lines):
+            value = match.group(2).strip()
+            value_lines = [value] if value else []
             
-            # If this line doesn't start a new field and we're in the middle of a field, append to current value
-            if not new_field_found and current_field and line:
-                # Only append if the line doesn't look like it might be a mislabeled field
-                if ':' not in line or line.split(':', 1)[0].strip().lower() not in [alt for alts in expected_fields.values() for alt in alts]:
-                    current_value.append(line)
+            is_last = i == len(field_lines) - 1
+            block_end = len(analysis) if is_last else field_lines[i + 1][0].start()
+            for line in analysis[match.end():block_end].split('\n'):
+                line = line.strip()
+                if line:  # Skip empty lines
+                    value_lines.append(line)
             
-            # If we're at the last line and have an active field, save it
-            if i == len(lines) - 1 and current_field and current_value:
-                result[current_field] = '\n'.join(current_value)
-        
-        # Third pass: extract numeric values from fields
-        numeric_fields = ["Total Experience (Years)", "Relevancy Score (0-100)", "Strong Matches Score", 
-                         "Partial Matches Score", "Job Stability"]
-        
-        for field in numeric_fields:
-            if result[field] != "Not Available":
-                # Try to extract a numeric value
-                matches = re.search(r'(\d+(?:\.\d+)?)', result[field])
-                if matches:
-                    result[field] = matches.group(1)
-        
-        # Special handling for Job Stability
-        if result["Job Stability"] != "Not Available" and not re.match(r'^\d+(?:\.\d+)?$', result["Job Stability"]):
-            # Try to extract a number from the text
-            matches = re.search(r'(\d+(?:\.\d+)?)/10', result["Job Stability"])
-            if matches:
-                result[field] = matches.group(1)
-            else:
-                matches = re.search(r'(\d+(?:\.\d+)?)', result["Job Stability"])
-                if matches:
-                    result[field] = matches.group(1)
+            # The last field is only kept when the response doesn't end on a blank line
+            if is_last and not analysis.rsplit('\n', 1)[-1].strip():
+                continue
+            if value_lines:
+                store_field(field, value_lines)
         
         # IMPORTANT FALLBACK: If we still don't have scores, calculate them manually
-        if (result["Strong Matches Score"] == "Not Available" or result["Strong Matches Score"] == "0") and \
-           (result["Partial Matches Score"] == "Not Available" or result["Partial Matches Score"] == "0") and \
+        if result["Strong Matches Score"] in _MISSING_SCORE_VALUES and \
+           result["Partial Matches Score"] in _MISSING_SCORE_VALUES and \
            resume_text and job_description:
             # Manually calculate scores as fallback with detailed reasoning
             strong_score, partial_score, strong_reasoning, partial_reasoning = calculate_skills_scores(resume_text, job_description)
@@ -619,40 +955,30 @@ def parse_analysis(analysis, resume_text=None, job_description=None):
             result["Strong Matches Reasoning"] = strong_reasoning
             result["Partial Matches Reasoning"] = partial_reasoning
         
-        # Normalize College Rating
-        if result["College Rating"] != "Not Available":
-            if "premium" in result["College Rating"].lower():
-                result["College Rating"] = "Premium"
-            elif "non" in result["College Rating"].lower() or "not" in result["College Rating"].lower():
-                result["College Rating"] = "Non-Premium"
-        
-        # Normalize International Team Experience
-        if result["International Team Experience"] != "Not Available":
-            if any(word in result["International Team Experience"].lower() for word in ["yes", "has", "worked", "experience"]):
-                if len(result["International Team Experience"]) < 5:  # Just "Yes" or similar
-                    result["International Team Experience"] = "Yes"
-            elif any(word in result["International Team Experience"].lower() for word in ["no", "not", "none"]):
-                if len(result["International Team Experience"]) < 5:  # Just "No" or similar
-                    result["International Team Experience"] = "No"
+        # Normalize College Rating and International Team Experience
+        for field, normalize in FIELD_NORMALIZERS:
+            if result[field] != "Not Available":
+                result[field] = normalize(result[field])
         
         # Handle LinkedIn URL extraction
-        if resume_text and (result["LinkedIn URL"] == "Not Available" or not result["LinkedIn URL"]):
+        linkedin_url = result["LinkedIn URL"]
+        if resume_text and linkedin_url in _MISSING_FIELD_VALUES:
             result["LinkedIn URL"] = extract_linkedin_url(resume_text)
-        elif result["LinkedIn URL"] != "Not Available":
-            linkedin_match = re.search(r'https?://(?:www\.)?linkedin\.com/in/[\w-]+(?:/[\w-]+)*', result["LinkedIn URL"])
+        elif linkedin_url != "Not Available":
+            linkedin_match = _LINKEDIN_PROFILE_RE.search(linkedin_url)
             if linkedin_match:
                 result["LinkedIn URL"] = linkedin_match.group(0)
             else:
-                extracted_url = extract_linkedin_url(result["LinkedIn URL"])
+                extracted_url = extract_linkedin_url(linkedin_url)
                 if extracted_url:
                     result["LinkedIn URL"] = extracted_url
         
         # Clean up Portfolio URL
         if result["Portfolio URL"] != "Not Available":
-            portfolio_match = re.search(r'https?://(?:www\.)?(?:github\.com|gitlab\.com|bitbucket\.org|behance\.net|dribbble\.com|[\w-]+\.(?:com|io|org|net))/\S+', result["Portfolio URL"])
+            portfolio_match = _PORTFOLIO_URL_RE.search(result["Portfolio URL"])
             if portfolio_match:
                 result["Portfolio URL"] = portfolio_match.group(0)
-            elif "not available" in result["Portfolio URL"].lower() or "not found" in result["Portfolio URL"].lower() or "not mentioned" in result["Portfolio URL"].lower():
+            elif _MISSING_VALUE_RE.search(result["Portfolio URL"]):
                 result["Portfolio URL"] = ""
         else:
             result["Portfolio URL"] = ""
@@ -662,22 +988,7 @@ def parse_analysis(analysis, resume_text=None, job_description=None):
             result["Work History"] = result["Latest Company"]
 
         # Handle Competitor Experience - should be blank (empty string) when no match found
-        if result["Competitor Experience"] == "Not Available" or not result["Competitor Experience"]:
-            # Check work history for competitor names
-            result["Competitor Experience"] = check_competitor_experience(result["Work History"], get_planful_competitors())
-        elif "no" in result["Competitor Experience"].lower() or "not" in result["Competitor Experience"].lower():
-            # If explicitly states no, then make it empty
-            result["Competitor Experience"] = ""
-        elif not result["Competitor Experience"].lower().startswith("yes"):
-            # If doesn't start with "Yes" but has content, check if it's a competitor name
-            competitor_found = False
-            for competitor in get_planful_competitors():
-                if competitor.lower() in result["Competitor Experience"].lower():
-                    result["Competitor Experience"] = f"Yes - {competitor}"
-                    competitor_found = True
-                    break
-            if not competitor_found:
-                result["Competitor Experience"] = ""
+        result["Competitor Experience"] = normalize_competitor_experience(result["Competitor Experience"], result["Work History"])
             
         # Clean all text fields
         for field in result:
@@ -696,125 +1007,319 @@ def parse_analysis(analysis, resume_text=None, job_description=None):
     
     except Exception as e:
         st.error(f"Error parsing AI response: {str(e)}")
-        import traceback
-        st.error(traceback.format_exc())
+        show_traceback()
         return None
 
-# Format Excel with styling and organization
-def format_excel_workbook(wb, columns):
-    try:
-        ws = wb.active
-        
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        
-        header_font = Font(name='Calibri', size=12, bold=True, color='FFFFFF')
-        header_fill = PatternFill(start_color='4F81BD', end_color='4F81BD', fill_type='solid')
-        header_alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        
-        normal_font = Font(name='Calibri', size=11)
-        normal_alignment = Alignment(vertical='center', wrap_text=True)
-        
-        score_alignment = Alignment(horizontal='center', vertical='center')
-        
-        url_font = Font(name='Calibri', size=11, color='0000FF', underline='single')
-        
-        competitor_yes_font = Font(name='Calibri', size=11, bold=True, color='FF0000')
+# Result columns holding numeric values stored as strings
+NUMERIC_RESULT_COLUMNS = [
+    "Total Experience (Years)", "Strong Matches Score", "Partial Matches Score",
+    "Relevancy Score (0-100)", "Overall Weighted Score", "Job Stability"
+]
+
+# Return a value derived from the latest batch's results, building it only on the first rerun that needs it
+# Kept in session state and cleared when a new batch replaces the results, so nothing outlives the batch it describes
+def results_artifact(key, build):
+    artifacts = st.session_state.results_artifacts
+    if key not in artifacts:
+        artifacts[key] = build()
+    return artifacts[key]
+
+# Select the display columns and show scores as numbers so the table sorts them numerically
+def build_display_dataframe(df, columns):
+    display_df = df[columns]
+    numeric_columns = [col for col in NUMERIC_RESULT_COLUMNS if col in columns]
+    return display_df.assign(**display_df[numeric_columns].apply(pd.to_numeric, errors="coerce"))
+
+# Bin a column of scores into fill categories in one vectorized pass
+# Returns int8 codes: 0 = not numeric, 1 = green (>= high), 2 = yellow (>= low), 3 = red
+def categorize_scores(values, high, low):
+    scores = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+    return np.select([scores >= high, scores >= low, ~np.isnan(scores)], [1, 2, 3], default=0).astype(np.int8)
+
+# Map a column of selection recommendations to the same fill codes in one vectorized pass
+# 1 = green (Strong/Good Fit), 2 = yellow (Consider), 3 = red (Reject), 4 = orange (Weak Fit), 0 = no fill
+def categorize_recommendations(values):
+    text = values.astype(str)
+    conditions = [
+        text.str.contains("Strong Fit", regex=False) | text.str.contains("Good Fit", regex=False),
+        text.str.contains("Consider", regex=False),
+        text.str.contains("Weak Fit", regex=False),
+        text.str.contains("Reject", regex=False)
+    ]
+    return np.select(conditions, [1, 2, 4, 3], default=0).astype(np.int8)
+
+# Write the formatted Excel report in a single streaming pass with xlsxwriter
+# output can be a path or a BytesIO; in_memory assembles the file in RAM instead of via temp files
+def write_excel_report(output, df, columns):
+    workbook = xlsxwriter.Workbook(output, {'in_memory': True, 'strings_to_urls': False})
+    ws = workbook.add_worksheet('Resume Analysis')
+    
+    header_format = workbook.add_format({
+        'font_name': 'Calibri', 'font_size': 12, 'bold': True, 'font_color': '#FFFFFF',
+        'bg_color': '#4F81BD', 'align': 'center', 'valign': 'vcenter', 'text_wrap': True, 'border': 1
+    })
+    
+    base_style = {'font_name': 'Calibri', 'font_size': 11, 'valign': 'vcenter', 'border': 1}
+    normal_style = dict(base_style, text_wrap=True)
+    score_style = dict(base_style, align='center')
+    
+    fill_colors = {'green': '#C6EFCE', 'yellow': '#FFEB9C', 'orange': '#FFD700', 'red': '#FFC7CE'}
+    
+    normal_format = workbook.add_format(normal_style)
+    url_format = workbook.add_format(dict(normal_style, font_color='#0000FF', underline=1))
+    competitor_yes_format = workbook.add_format(dict(normal_style, bold=True, font_color='#FF0000', bg_color=fill_colors['red']))
+    
+    score_formats = {None: workbook.add_format(score_style)}
+    score_formats.update({fill: workbook.add_format(dict(score_style, bg_color=color)) for fill, color in fill_colors.items()})
+    college_formats = {fill: workbook.add_format(dict(normal_style, bg_color=fill_colors[fill])) for fill in ('green', 'yellow')}
+    
+    # Classify each column once so the row loop doesn't repeat substring checks per cell
+    def column_kind(column_name):
+        if column_name == "Selection Recommendation":
+            return "recommendation"
+        if column_name == "Job Stability":
+            return "stability"
+        if any(term in column_name for term in ["Score", "Job Stability"]):
+            return "score"
+        if "Recommendation" in column_name:
+            return "centered"
+        if column_name == "College Rating":
+            return "college"
+        if column_name in ["LinkedIn URL", "Portfolio URL"]:
+            return "url"
+        if column_name == "Competitor Experience":
+            return "competitor"
+        return "text"
+    
+    # Pick the format for a data cell based on its column kind and value
+    def cell_format(kind, value):
+        if kind == "text":
+            return normal_format
         
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
+        text = str(value)
         
-        # Apply formatting to headers
-        for col_num, column in enumerate(columns, 1):
-            cell = ws.cell(row=1, column=col_num)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = thin_border
+        if kind == "centered":
+            return score_formats[None]
         
-        # Apply formatting to data cells
-        max_row = ws.max_row if ws.max_row else 1  # Protect against empty worksheet
-        max_col = ws.max_column if ws.max_column else 1
+        if text == "Not Available":
+            return normal_format
         
-        for row in range(2, max_row + 1):
-            for col in range(1, max_col + 1):
-                cell = ws.cell(row=row, column=col)
-                if not cell.value:  # Skip empty cells
-                    continue
-                    
-                cell.font = normal_font
-                cell.alignment = normal_alignment
-                cell.border = thin_border
-                
-                if col <= len(columns):  # Ensure we don't go out of bounds
-                    column_name = columns[col-1]
-                    
-                    if any(term in column_name for term in ["Score", "Recommendation", "Job Stability"]):
-                        cell.alignment = score_alignment
-                        
-                        if cell.value not in ["Not Available", None, ""]:
-                            try:
-                                if any(term in column_name for term in ["Score", "Job Stability"]):
-                                    score_value = float(cell.value)
-                                    if score_value >= 75 or (column_name == "Job Stability" and score_value >= 8):
-                                        cell.fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')  # Green
-                                    elif score_value >= 50 or (column_name == "Job Stability" and score_value >= 6):
-                                        cell.fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')  # Yellow
-                                    else:
-                                        cell.fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')  # Red
-                            except (ValueError, TypeError):
-                                pass
-                    
-                    if column_name == "College Rating" and cell.value not in ["Not Available", None, ""]:
-                        if "premium" in str(cell.value).lower() and "non" not in str(cell.value).lower():
-                            cell.fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')  # Green
-                        elif "non-premium" in str(cell.value).lower():
-                            cell.fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')  # Yellow
-                    
-                    if column_name == "Selection Recommendation" and cell.value not in ["Not Available", None, ""]:
-                        if "Strong Fit" in str(cell.value) or "Good Fit" in str(cell.value):
-                            cell.fill = PatternFill(start_color='C6EFCE', end_color='C6EFCE', fill_type='solid')  # Green
-                        elif "Consider" in str(cell.value):
-                            cell.fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')  # Yellow
-                        elif "Weak Fit" in str(cell.value):
-                            cell.fill = PatternFill(start_color='FFD700', end_color='FFD700', fill_type='solid')  # Orange
-                        elif "Reject" in str(cell.value):
-                            cell.fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')  # Red
-                    
-                    if column_name in ["LinkedIn URL", "Portfolio URL"] and cell.value not in ["Not Available", None, ""]:
-                        cell.font = url_font
-                        try:
-                            cell.hyperlink = cell.value
-                        except Exception:
-                            # Fallback if hyperlink fails
-                            pass
-                    
-                    if column_name == "Competitor Experience" and cell.value not in ["Not Available", None, ""]:
-                        if str(cell.value).lower().startswith("yes"):
-                            cell.font = competitor_yes_font
-                            cell.fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')  # Red background
+        if kind == "college":
+            text_lower = text.lower()
+            if "premium" in text_lower and "non" not in text_lower:
+                return college_formats['green']
+            elif "non-premium" in text_lower:
+                return college_formats['yellow']
+        elif kind == "url":
+            return url_format
+        elif kind == "competitor" and text.lower().startswith("yes"):
+            return competitor_yes_format
         
-        # Set column widths
-        for col_num, column in enumerate(columns, 1):
-            column_letter = openpyxl.utils.get_column_letter(col_num)
-            if any(term in column for term in ["Skills", "Reasoning", "Leadership", "International", "Experience", "Work History"]):
-                ws.column_dimensions[column_letter].width = 40
-            elif any(term in column for term in ["Recommendation", "Notice", "Company", "College", "URL"]):
-                ws.column_dimensions[column_letter].width = 30
+        return normal_format
+    
+    column_kinds = [column_kind(column) for column in columns]
+    
+    # Score and recommendation colours are decided per column up front rather than per cell in the row loop
+    fill_code_formats = [score_formats[None], score_formats['green'], score_formats['yellow'], score_formats['red'], score_formats['orange']]
+    score_thresholds = {"score": (75, 50), "stability": (8, 6)}
+    
+    def column_fill_formats(column, kind):
+        if kind in score_thresholds:
+            codes = categorize_scores(df[column], *score_thresholds[kind])
+        elif kind == "recommendation":
+            codes = categorize_recommendations(df[column])
+        else:
+            return None
+        return [fill_code_formats[code] for code in codes]
+    
+    column_formats = [column_fill_formats(column, kind) for column, kind in zip(columns, column_kinds)]
+    
+    # Set column widths and freeze the top row before streaming rows
+    for col_num, column in enumerate(columns):
+        if any(term in column for term in ["Skills", "Reasoning", "Leadership", "International", "Experience", "Work History"]):
+            ws.set_column(col_num, col_num, 40)
+        elif any(term in column for term in ["Recommendation", "Notice", "Company", "College", "URL"]):
+            ws.set_column(col_num, col_num, 30)
+        else:
+            ws.set_column(col_num, col_num, 18)
+    ws.freeze_panes(1, 0)
+    
+    ws.write_row(0, 0, columns, header_format)
+    
+    for row_num, row in enumerate(df[columns].itertuples(index=False), 1):
+        for col_num, (kind, formats, value) in enumerate(zip(column_kinds, column_formats, row)):
+            if pd.isna(value) or value == "":  # Leave empty cells unformatted
+                continue
+            
+            fmt = formats[row_num - 1] if formats else cell_format(kind, value)
+            if fmt is url_format and str(value).startswith("http"):
+                ws.write_url(row_num, col_num, str(value), url_format)
             else:
-                ws.column_dimensions[column_letter].width = 18
-        
-        # Freeze the top row
-        ws.freeze_panes = "A2"
+                ws.write(row_num, col_num, value, fmt)
+    
+    workbook.close()
+
+# Build the Excel report bytes for the given columns
+def build_excel_report(df, columns):
+    buffer = BytesIO()
+    write_excel_report(buffer, df, columns)
+    return buffer.getvalue()
+
+# Group resumes needing analysis into batches of up to batch_size that fit in the model's context window
+# A resume too large to share a call still gets a batch of its own
+def plan_analysis_batches(results, job_description, batch_size):
+    # Every call carries the system message and the prompt scaffold (instructions and job description)
+    base_chars = len(ANALYSIS_SYSTEM_MESSAGE) + len(build_batch_prompt([], job_description))
+    base_tokens = base_chars // CHARS_PER_TOKEN + CONTEXT_SAFETY_MARGIN_TOKENS
+    batches = []
+    current, current_tokens = [], base_tokens
+    for result in results:
+        # Each resume adds its text in <RESUME_i> tags plus room for its analysis in the response
+        tag_chars = len(f"<RESUME_{MAX_BATCH_SIZE}>\n\n</RESUME_{MAX_BATCH_SIZE}>\n")
+        tokens = (len(result["resume_text"]) + tag_chars) // CHARS_PER_TOKEN + ANALYSIS_MAX_TOKENS
+        if current and (len(current) >= batch_size or current_tokens + tokens > MODEL_CONTEXT_TOKENS):
+            batches.append(current)
+            current, current_tokens = [], base_tokens
+        current.append(result)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+# Concurrency limit for Groq calls that adapts to rate limiting
+# Each 429 lowers the limit by one (down to a floor); a run of successes raises it again up to the configured pool size
+# Slots are only handed out on the event loop thread, so plain counters are safe here
+class AdaptiveConcurrencyLimiter:
+    def __init__(self, max_limit):
+        self.max_limit = max_limit
+        self.min_limit = min(MIN_CONCURRENCY, max_limit)
+        self.limit = max_limit
+        self.inflight = 0
+        self.consecutive_successes = 0
+        self.rate_limited_count = 0
+        self._condition = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.inflight < self.limit)
+            self.inflight += 1
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.inflight -= 1
+            if exc_type is not None and issubclass(exc_type, RateLimitError):
+                self.rate_limited_count += 1
+                self.consecutive_successes = 0
+                self.limit = max(self.min_limit, self.limit - 1)
+            elif exc_type is None:
+                self.consecutive_successes += 1
+                if self.consecutive_successes >= CONCURRENCY_RAMP_UP_SUCCESSES and self.limit < self.max_limit:
+                    self.limit += 1
+                    self.consecutive_successes = 0
+            self._condition.notify_all()
+
+# Whether a failed Groq call is worth retrying: rate limits, server errors, dropped connections, timeouts,
+# and the 408/409 statuses; anything else (e.g. a bad request) would fail the same way again
+def is_retryable_error(error):
+    if isinstance(error, (RateLimitError, InternalServerError, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+# Seconds to wait before retrying a failed call, honouring the server's Retry-After header when present
+# Random jitter spreads out batches that failed together so they don't all retry at the same moment
+def retry_delay(error, attempt):
+    try:
+        delay = min(float(error.response.headers.get("retry-after")), RETRY_MAX_DELAY_SECONDS)
+        return delay + random.uniform(0, RETRY_BASE_DELAY_SECONDS)
+    except (AttributeError, TypeError, ValueError):
+        return RETRY_BASE_DELAY_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+# Run one Groq call while holding a slot in the shared limiter
+# Rate-limited and transiently failed calls give up their slot while they wait, then retry;
+# only rate limits lower the concurrency limit
+# Returns the call's result, when its last attempt started, and the exception it finally failed with (None on success)
+async def call_with_retries(limiter, make_call):
+    start_time = time.time()
+    for attempt in range(API_RETRIES + 1):
+        try:
+            async with limiter:
+                start_time = time.time()
+                return await make_call(), start_time, None
+        except Exception as e:
+            if not is_retryable_error(e) or attempt == API_RETRIES:
+                return None, start_time, e
+            await asyncio.sleep(retry_delay(e, attempt))
+
+# Analyze a single resume in its own call, recording the analysis or the error on its result
+async def analyze_single_result(client, result, prompt_builder, limiter):
+    analysis, start_time, error = await call_with_retries(
+        limiter, lambda: analyze_resume_async(client, result["resume_text"], prompt_builder))
+    result.update(start_time=start_time, analysis=analysis)
+    if error:
+        result["error"] = f"Error during analysis: {str(error)}"
+
+# Analyze one batch of resumes, in a single call or one batched call
+# Resumes a batched call leaves without an analysis (omitted, malformed or unparseable, or a request the API
+# rejected) are re-sent one at a time; a batch still failing transiently after its retries isn't split, as that only adds load
+# No Streamlit calls are made here; results are rendered by the caller as batches complete
+async def process_batch_async(client, batch, job_description, prompt_builder, limiter):
+    if len(batch) == 1:
+        await analyze_single_result(client, batch[0], prompt_builder, limiter)
+    else:
+        analyses, start_time, error = await call_with_retries(
+            limiter, lambda: analyze_resumes_batch_async(client, [result["resume_text"] for result in batch], job_description))
+        for result, analysis in zip(batch, analyses or [None] * len(batch)):
+            result.update(start_time=start_time, analysis=analysis)
         
-        return wb
-    except Exception as e:
-        st.error(f"Error formatting Excel: {str(e)}")
-        # Return the unformatted workbook as fallback
-        return wb
+        missing = [result for result in batch if not result["analysis"]]
+        if error is not None and is_retryable_error(error):
+            for result in missing:
+                result["error"] = f"Error during analysis: {str(error)}"
+        else:
+            await asyncio.gather(*(analyze_single_result(client, result, prompt_builder, limiter) for result in missing))
+    
+    analysis_cache, cache_lock = get_analysis_cache()
+    for result in batch:
+        if result["analysis"]:
+            with cache_lock:
+                analysis_cache[analysis_cache_key(result["resume_text"], job_description)] = result["analysis"]
+    return batch
+
+# Analyze all resumes concurrently, calling on_result in completion order for incremental progress
+# Unreadable resumes and cached AI responses are reported straight away; the rest are sent in batches
+# Returns the final concurrency limit and rate-limit count so they can be shown in the timing breakdown
+async def analyze_resumes_concurrently(client, extractions, job_description, pool_size, batch_size, on_result):
+    analysis_cache, cache_lock = get_analysis_cache()
+    completed = 0
+    pending = []
+    # Each result carries its position in the upload so callers can restore upload order
+    for upload_index, extraction in enumerate(extractions):
+        result = dict(extraction, upload_index=upload_index, analysis=None, cached=False, start_time=time.time())
+        if result["resume_text"]:
+            # Reuse the AI response for unchanged resume/JD pairs instead of calling the API again
+            with cache_lock:
+                result["analysis"] = analysis_cache.get(analysis_cache_key(result["resume_text"], job_description))
+            if not result["analysis"]:
+                pending.append(result)
+                continue
+            result["cached"] = True
+        completed += 1
+        on_result(result, completed)
+    
+    limiter = AdaptiveConcurrencyLimiter(pool_size)
+    prompt_builder = make_prompt_builder(job_description)
+    tasks = [process_batch_async(client, batch, job_description, prompt_builder, limiter)
+             for batch in plan_analysis_batches(pending, job_description, batch_size)]
+    
+    try:
+        for task in asyncio.as_completed(tasks):
+            for result in await task:
+                completed += 1
+                on_result(result, completed)
+    finally:
+        await client.close()
+    
+    return {"final_limit": limiter.limit, "rate_limited_count": limiter.rate_limited_count}
 
 # Main Streamlit App
 def main():
@@ -860,6 +1365,14 @@ def main():
             parsing_timer_container = st.empty()
             avg_timer_container = st.empty()
             total_timer_container = st.empty()
+        
+        # Limit concurrent Groq requests to stay within API rate limits
+        pool_size = st.slider("Concurrent API requests", min_value=1, max_value=32, value=DEFAULT_POOL_SIZE,
+                              help="Number of resumes analyzed in parallel")
+        batch_size = st.slider("Resumes per API call", min_value=1, max_value=MAX_BATCH_SIZE, value=DEFAULT_BATCH_SIZE,
+                               help="Send several resumes in one request to cut API round trips")
+        # Stored in session state under "debug"; the raw AI output is only rendered when this is on
+        st.checkbox("Debug", value=False, key="debug", help="Show the raw AI response for each resume")
     
     try:
         load_dotenv()
@@ -870,16 +1383,9 @@ def main():
             st.info("You can get an API key from https://console.groq.com/")
             return
             
-        client = initialize_groq_client()
-        if not client:
-            st.error("Failed to initialize Groq client. Please check your API key.")
-            return
-            
         uploaded_files = st.file_uploader("Upload resumes (PDF)", type=['pdf'], accept_multiple_files=True)
         job_description = st.text_area("Paste the job description here", height=200)
         
-        results_data = []
-        
         # Initialize timer metrics in session state
         if 'total_processing_time' not in st.session_state:
             st.session_state.total_processing_time = 0
@@ -892,83 +1398,133 @@ def main():
         if 'total_extraction_time' not in st.session_state:
             st.session_state.total_extraction_time = 0
         
+        # Keep the latest batch's results, and the frames and report built from them, across reruns
+        if 'results_data' not in st.session_state:
+            st.session_state.results_data = []
+            st.session_state.results_artifacts = {}
+        
         if uploaded_files and job_description:
             if st.button("Analyze All Resumes"):
+                client = initialize_groq_client(pool_size)
+                if not client:
+                    st.error("Failed to initialize Groq client. Please check your API key.")
+                    return
+                
                 progress_bar = st.progress(0)
                 total_files = len(uploaded_files)
                 
                 # Start batch timing
                 batch_start_time = time.time()
                 
-                for i, uploaded_file in enumerate(uploaded_files):
-                    st.subheader(f"Resume: {uploaded_file.name}")
+                current_timer_container.metric("⏱️ Current Resume", "Processing...")
+                
+                # Collect results and timings locally; Streamlit output is rendered once after the batch
+                local_results = []
+                batch_totals = {"extraction": 0.0, "api": 0.0, "parsing": 0.0, "processing": 0.0, "count": 0}
+                
+                def handle_result(item, completed):
+                    batch_totals["extraction"] += item["extraction_time"]
+                    item["parsed_data"] = None
+                    item["api_call_time"] = 0.0
+                    item["parsing_time"] = 0.0
+                    analysis = item["analysis"]
+                    
+                    if item["resume_text"]:
+                        # Extract API call time from embedded data in analysis
+                        # Cached responses made no API call in this run
+                        api_time_match = _API_TIME_RE.search(analysis) if analysis and not item["cached"] else None
+                        if api_time_match:
+                            item["api_call_time"] = float(api_time_match.group(1))
+                        batch_totals["api"] += item["api_call_time"]
+                        
+                        if analysis:
+                            # Time the parsing process
+                            parsing_start = time.time()
+                            item["parsed_data"] = parse_analysis(analysis, item["resume_text"], job_description)
+                            item["parsing_time"] = time.time() - parsing_start
+                            batch_totals["parsing"] += item["parsing_time"]
                     
-                    # Start timer for individual resume
-                    resume_start_time = time.time()
-                    current_timer_container.metric("⏱️ Current Resume", "Processing...")
+                    if item["parsed_data"]:
+                        item["resume_time"] = item["extraction_time"] + (time.time() - item["start_time"])
+                        batch_totals["processing"] += item["resume_time"]
+                        batch_totals["count"] += 1
+                        current_timer_container.metric("⏱️ Current Resume", f"{item['resume_time']:.2f} seconds")
                     
-                    with st.spinner(f"Analyzing {uploaded_file.name}..."):
-                        # Time the PDF extraction
-                        extraction_start = time.time()
-                        resume_text = extract_text_from_pdf(uploaded_file)
-                        extraction_time = time.time() - extraction_start
-                        st.session_state.total_extraction_time += extraction_time
+                    local_results.append(item)
+                    progress_bar.progress(completed / total_files, text="Analyzing resumes...")
+                
+                # Extract all PDFs up front so the analysis phase only waits on the API
+                with st.spinner(f"Extracting text from {total_files} resumes..."):
+                    extractions = extract_pdfs_concurrently(
+                        uploaded_files,
+                        lambda completed: progress_bar.progress(completed / total_files, text="Extracting text from PDFs...")
+                    )
+                
+                with st.spinner(f"Analyzing {total_files} resumes..."):
+                    concurrency_stats = asyncio.run(analyze_resumes_concurrently(client, extractions, job_description, pool_size, batch_size, handle_result))
+                
+                # Update session timing metrics once for the whole batch
+                st.session_state.total_extraction_time += batch_totals["extraction"]
+                st.session_state.total_api_time += batch_totals["api"]
+                st.session_state.total_parsing_time += batch_totals["parsing"]
+                st.session_state.total_processing_time += batch_totals["processing"]
+                st.session_state.processed_count += batch_totals["count"]
+                
+                if local_results:
+                    last_result = local_results[-1]
+                    api_call_timer_container.metric("⏱️ API Call", f"{last_result['api_call_time']:.2f} seconds")
+                    parsing_timer_container.metric("⏱️ Parsing", f"{last_result['parsing_time']:.2f} seconds")
+                if st.session_state.processed_count > 0:
+                    avg_time = st.session_state.total_processing_time / st.session_state.processed_count
+                    avg_timer_container.metric("⏱️ Average Time", f"{avg_time:.2f} seconds/resume")
+                    total_timer_container.metric("⏱️ Total Time", f"{st.session_state.total_processing_time:.2f} seconds")
+                
+                # Results arrive in completion order; render, store and export them in upload order
+                local_results.sort(key=lambda item: item["upload_index"])
+                
+                # Render every resume's results in a single pass
+                results_data = []
+                for item in local_results:
+                    st.subheader(f"Resume: {item['file_name']}")
+                    
+                    if item["error"]:
+                        st.error(item["error"])
+                    
+                    if not item["resume_text"]:
+                        if not item["error"]:
+                            st.error(f"Could not extract text from {item['file_name']}")
+                        continue
+                    
+                    if not item["analysis"]:
+                        continue
+                    
+                    # Skip the raw-response scan and render unless debugging is switched on
+                    if st.session_state.get("debug", False):
+                        show_analysis_debug(item["analysis"], item["api_call_time"])
+                    
+                    parsed_data = item["parsed_data"]
+                    if not parsed_data:
+                        st.warning(f"Could not extract structured data for {item['file_name']}")
+                        continue
+                    
+                    results_data.append(parsed_data)
+                    
+                    # Success message with timing information
+                    st.success(f"Successfully analyzed {item['file_name']} in {item['resume_time']:.2f} seconds")
+                    
+                    # Add an expander to show the skill match reasoning
+                    with st.expander("View Skill Matching Details", expanded=False):
+                        st.markdown("### Strong Matches")
+                        st.markdown(f"**Score: {parsed_data['Strong Matches Score']}**")
+                        st.markdown(parsed_data["Strong Matches Reasoning"])
                         
-                        if resume_text:
-                            # Time the AI analysis (API call)
-                            api_call_start = time.time()
-                            analysis = analyze_resume(client, resume_text, job_description)
-                            api_call_time = time.time() - api_call_start
-                            
-                            # Extract API call time from embedded data in analysis
-                            api_time_match = re.search(r'API call time: (\d+\.\d+)', analysis) if analysis else None
-                            if api_time_match:
-                                api_call_time = float(api_time_match.group(1))
-                            
-                            st.session_state.total_api_time += api_call_time
-                            api_call_timer_container.metric("⏱️ API Call", f"{api_call_time:.2f} seconds")
-                            
-                            if analysis:
-                                # Time the parsing process
-                                parsing_start = time.time()
-                                parsed_data = parse_analysis(analysis, resume_text, job_description)
-                                parsing_time = time.time() - parsing_start
-                                st.session_state.total_parsing_time += parsing_time
-                                parsing_timer_container.metric("⏱️ Parsing", f"{parsing_time:.2f} seconds")
-                                
-                                if parsed_data:
-                                    results_data.append(parsed_data)
-                                    
-                                    # Calculate and display time metrics for this resume
-                                    resume_time = time.time() - resume_start_time
-                                    st.session_state.total_processing_time += resume_time
-                                    st.session_state.processed_count += 1
-                                    
-                                    # Update timer metrics in sidebar
-                                    current_timer_container.metric("⏱️ Current Resume", f"{resume_time:.2f} seconds")
-                                    
-                                    avg_time = st.session_state.total_processing_time / st.session_state.processed_count
-                                    avg_timer_container.metric("⏱️ Average Time", f"{avg_time:.2f} seconds/resume")
-                                    total_timer_container.metric("⏱️ Total Time", f"{st.session_state.total_processing_time:.2f} seconds")
-                                    
-                                    # Success message with timing information
-                                    st.success(f"Successfully analyzed {uploaded_file.name} in {resume_time:.2f} seconds")
-                                    
-                                    # Add an expander to show the skill match reasoning
-                                    with st.expander("View Skill Matching Details", expanded=False):
-                                        st.markdown("### Strong Matches")
-                                        st.markdown(f"**Score: {parsed_data['Strong Matches Score']}**")
-                                        st.markdown(parsed_data["Strong Matches Reasoning"])
-                                        
-                                        st.markdown("### Partial Matches")
-                                        st.markdown(f"**Score: {parsed_data['Partial Matches Score']}**")
-                                        st.markdown(parsed_data["Partial Matches Reasoning"])
-                                else:
-                                    st.warning(f"Could not extract structured data for {uploaded_file.name}")
-                        else:
-                            st.error(f"Could not extract text from {uploaded_file.name}")
-                            
-                    progress_bar.progress((i + 1) / total_files)
+                        st.markdown("### Partial Matches")
+                        st.markdown(f"**Score: {parsed_data['Partial Matches Score']}**")
+                        st.markdown(parsed_data["Partial Matches Reasoning"])
+                
+                # Replace the previous batch's results
+                st.session_state.results_data = results_data
+                st.session_state.results_artifacts = {}
                 
                 # Calculate and show total batch processing time
                 batch_time = time.time() - batch_start_time
@@ -1004,7 +1560,12 @@ def main():
                         })
                         timing_df["Percentage"] = (timing_df["Total Time (sec)"] / st.session_state.total_processing_time * 100).round(1).astype(str) + '%'
                         st.table(timing_df)
+                        
+                        # Show where adaptive concurrency settled so the pool size can be tuned manually
+                        st.caption(f"Concurrent API requests: started at {pool_size}, finished at {concurrency_stats['final_limit']} "
+                                   f"({concurrency_stats['rate_limited_count']} rate-limited calls)")
         
+        results_data = st.session_state.results_data
         if results_data:
             st.subheader("Analysis Results")
             
@@ -1013,7 +1574,7 @@ def main():
                 results_start_time = time.time()
                 
                 # Create DataFrame with the extracted data
-                df = pd.DataFrame(results_data)
+                df = results_artifact("results_df", lambda: pd.DataFrame(results_data))
                 
                 # Define the key columns for display in the UI
                 display_columns = [
@@ -1028,7 +1589,8 @@ def main():
                 available_columns = [col for col in display_columns if col in df.columns]
                 
                 if available_columns:
-                    st.dataframe(df[available_columns])
+                    display_df = results_artifact("display_df", lambda: build_display_dataframe(df, available_columns))
+                    st.dataframe(display_df)
                 else:
                     st.warning("No columns to display. Please check the AI response format.")
                     st.write("DataFrame columns:", df.columns.tolist())
@@ -1054,49 +1616,31 @@ def main():
                 with st.spinner("Preparing Excel file..."):
                     excel_start_time = time.time()
                     try:
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmpfile:
-                            # Make sure we're saving the dataframe with all available columns
-                            if available_export_columns:
-                                export_df = df[available_export_columns]
-                            else:
-                                export_df = df  # Use all columns if our expected ones aren't found
-                            
-                            export_df.to_excel(tmpfile.name, index=False, sheet_name='Resume Analysis', engine='openpyxl')
-                            wb = openpyxl.load_workbook(tmpfile.name)
-                            
-                            if available_export_columns:
-                                wb = format_excel_workbook(wb, available_export_columns)
-                            else:
-                                # If no expected columns, use whatever columns are in the dataframe
-                                wb = format_excel_workbook(wb, df.columns.tolist())
-                            
-                            wb.save(tmpfile.name)
-                            tmpfile_path = tmpfile.name
+                        # Make sure we're saving the dataframe with all available columns
+                        if available_export_columns:
+                            file_data = results_artifact("excel", lambda: build_excel_report(df, available_export_columns))
+                        else:
+                            # If no expected columns, use whatever columns are in the dataframe
+                            file_data = results_artifact("excel", lambda: build_excel_report(df, df.columns.tolist()))
                         
                         excel_time = time.time() - excel_start_time
                         st.success(f"Excel report ready! (Prepared in {excel_time:.2f} seconds)")
                         
-                        with open(tmpfile_path, "rb") as file:
-                            file_data = file.read()
-                            st.download_button(
-                                label="📥 Download Complete Resume Analysis Report",
-                                data=file_data,
-                                file_name=f"resume_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                            )
-
-                        os.unlink(tmpfile_path)
+                        st.download_button(
+                            label="📥 Download Complete Resume Analysis Report",
+                            data=file_data,
+                            file_name=f"resume_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        )
                     except Exception as e:
                         st.error(f"Error creating Excel file: {str(e)}")
                         st.info("You can still see the results in the table above.")
             except Exception as e:
                 st.error(f"Error processing results: {str(e)}")
-                import traceback
-                st.error(traceback.format_exc())
+                show_traceback()
     except Exception as e:
         st.error(f"An unexpected error occurred: {str(e)}")
-        import traceback
-        st.error(traceback.format_exc())
+        show_traceback()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,53 @@
+import pypdfium2
+import PyPDF2
+import threading
+import time
+from io import BytesIO
+
+# PDF text extraction kept free of Streamlit so it can run in worker threads and processes
+
+# PDFium is not thread-safe, so calls into it are serialized across extraction threads
+# Defined in an imported module rather than the Streamlit script so every session shares one lock
+_PDFIUM_LOCK = threading.Lock()
+
+# Stop extracting once this much text is collected; it is already far more than fits in the model's context
+MAX_EXTRACTED_CHARS = 200_000
+
+# Yield the non-empty page texts, stopping after the page that reaches MAX_EXTRACTED_CHARS
+def limit_page_texts(page_texts):
+    total_chars = 0
+    for page_text in page_texts:
+        if page_text:
+            yield page_text
+            total_chars += len(page_text)
+            if total_chars >= MAX_EXTRACTED_CHARS:
+                return
+
+# Extract text from PDF bytes using PDFium, falling back to PyPDF2 for files PDFium can't open
+def extract_text_from_pdf_bytes(pdf_bytes):
+    try:
+        with _PDFIUM_LOCK:
+            pdf = pypdfium2.PdfDocument(pdf_bytes)
+            try:
+                page_texts = (page.get_textpage().get_text_range() for page in pdf)
+                text = "\n".join(limit_page_texts(page_texts))
+            finally:
+                pdf.close()
+    except pypdfium2.PdfiumError:
+        # Extract each page once and skip empty ones without building an intermediate list
+        pdf_reader = PyPDF2.PdfReader(BytesIO(pdf_bytes))
+        page_texts = (page.extract_text() for page in pdf_reader.pages)
+        text = "\n".join(limit_page_texts(page_texts))
+    return text if text else None
+
+# Extract a single PDF, capturing the error so one corrupt file doesn't sink the batch
+# Takes the file name and raw bytes (not the UploadedFile) so it can be sent to a worker process
+def extract_pdf_for_batch(file_name, pdf_bytes):
+    extraction = {"file_name": file_name, "resume_text": None, "error": None}
+    extraction_start = time.time()
+    try:
+        extraction["resume_text"] = extract_text_from_pdf_bytes(pdf_bytes)
+    except Exception as e:
+        extraction["error"] = f"Error extracting text from PDF: {str(e)}"
+    extraction["extraction_time"] = time.time() - extraction_start
+    return extraction